@@ -1,74 +1,191 @@
 import os
-from typing import Dict, List, Optional, Set
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Set
+import httpx
 from notion_client import Client
-from datetime import datetime
+from notion_client.errors import HTTPResponseError, RequestTimeoutError
+from datetime import datetime, timezone
 from loguru import logger
-import requests
-import json
+import orjson
+from config import Config
+
+# Largest page size accepted by the Notion query endpoint
+PAGE_SIZE = 100
+# Most conditions Notion accepts in one compound filter
+MAX_FILTER_CONDITIONS = 100
+# Document page properties written by the sync, compared to skip no-op updates
+DOCUMENT_PROPERTIES = (
+    "Title", "paperless_id", "Created Date", "Added Date", "Archived", "Correspondent", "Tags", "File"
+)
+# Paperless document fields read by create_or_update_document and the sync loop
+DOCUMENT_FIELDS = [
+    "id", "title", "created", "added", "modified", "correspondent", "tags",
+    "archived_file_name", "original_file_name"
+]
+# Attempts per request for rate limits, transient server errors and timeouts
+MAX_ATTEMPTS = 5
+# Longest wait between attempts, in seconds
+MAX_BACKOFF = 60
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Strings already in the exact form datetime.isoformat() produces
+_ISO_DATETIME = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d{6})?([+-]\d{2}:\d{2})?")
+
+
+@lru_cache(maxsize=4096)
+def _normalize_date(value) -> Optional[str]:
+    """Convert a Paperless date to ISO format, or None if it cannot be parsed"""
+    if isinstance(value, str):
+        if _ISO_DATETIME.fullmatch(value):
+            return value
+        try:
+            return datetime.fromisoformat(value).isoformat()
+        except ValueError:
+            return None
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value).isoformat()
+    return value
+
+
+def _to_json(data) -> str:
+    """Pretty-print data for debug logs"""
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2, default=str).decode()
+
+
+def _eq_filter(paperless_id: int) -> Dict:
+    """Notion query filter matching a single Paperless ID"""
+    return {"property": "paperless_id", "number": {"equals": paperless_id}}
+
+
+def _comparable_date(value: Optional[str]) -> Optional[str]:
+    """Normalise a date string so that equal instants compare equal whatever their formatting"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return value
+    if "T" not in value:
+        return parsed.date().isoformat()
+    # Notion treats dates without an offset as UTC
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def _property_value(prop: Optional[Dict]):
+    """Extract the comparable value of a property, as sent to or as returned by Notion"""
+    if not prop:
+        return None
+    kind = prop.get("type") or next(iter(prop))
+    value = prop[kind]
+    if kind in ("title", "rich_text"):
+        value = "".join(part.get("plain_text", part.get("text", {}).get("content", "")) for part in value)
+    elif kind == "date":
+        value = _comparable_date(value["start"]) if value else None
+    elif kind == "relation":
+        # Pages only list the first 25 related pages; a truncated relation never compares equal
+        value = object() if prop.get("has_more") else tuple(sorted(related["id"] for related in value))
+    elif kind == "files":
+        value = tuple((f.get("name"), f.get(f.get("type", "external"), {}).get("url")) for f in value)
+    # Notion reports cleared properties as empty values rather than leaving them out
+    return value or None
+
+
+def _fingerprint(properties: Dict, names) -> tuple:
+    """Comparable snapshot of the named properties"""
+    return tuple(_property_value(properties.get(name)) for name in names)
+
+
+def _backoff(attempt: int, error: Exception) -> float:
+    """Seconds to wait before retrying, honouring Retry-After when Notion sends it"""
+    headers = getattr(error, "headers", None) or {}
+    try:
+        return min(float(headers["Retry-After"]), MAX_BACKOFF)
+    except (KeyError, ValueError):
+        return min(2 ** attempt + random.uniform(0, 1), MAX_BACKOFF)
+
+
+class RetryingClient(Client):
+    """notion_client Client that retries rate-limited, failed and timed-out requests, creating pages at most once"""
+
+    def request(self, *args, **kwargs):
+        # Page creation has no idempotency key: after a timeout or 5xx the page usually exists already,
+        # so only a rate limit (which Notion rejects unprocessed) is safe to retry without duplicating it
+        creates_page = kwargs.get("method") == "POST" and kwargs.get("path") == "pages"
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                return super().request(*args, **kwargs)
+            except (HTTPResponseError, RequestTimeoutError) as e:
+                if creates_page:
+                    retryable = isinstance(e, HTTPResponseError) and e.status == 429
+                else:
+                    retryable = isinstance(e, RequestTimeoutError) or e.status in RETRY_STATUSES
+                if not retryable or attempt == MAX_ATTEMPTS - 1:
+                    raise
+                delay = _backoff(attempt, e)
+                logger.warning(f"Notion request failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+
+class UnresolvedRelationsError(Exception):
+    """A document page was written, but its correspondent or some of its tags could not be linked"""
+
 
 class NotionClient:
-    def __init__(self):
-        self.client = Client(auth=os.getenv("NOTION_TOKEN"))
-        self.documents_db = os.getenv("NOTION_DOCUMENTS_DB")
-        self.tags_db = os.getenv("NOTION_TAGS_DB")
-        self.correspondents_db = os.getenv("NOTION_CORRESPONDENTS_DB")
+    def __init__(self, config: Optional[Config] = None):
+        config = config or Config.from_env()
+        # HTTP/2 multiplexes the concurrent document writes over one TLS connection
+        self.client = RetryingClient(auth=config.notion_token, client=httpx.Client(http2=True))
+        self.documents_db = config.notion_documents_db
+        self.tags_db = config.notion_tags_db
+        self.correspondents_db = config.notion_correspondents_db
+        # Base for the file links stored on document pages
+        self.paperless_url = config.paperless_url
+        # Paperless ID -> Notion page ID, loaded lazily on first lookup
+        self._tag_id_cache: Optional[Dict[int, str]] = None
+        self._correspondent_id_cache: Optional[Dict[int, str]] = None
+        self._doc_page_ids: Optional[Dict[int, str]] = None
+        # Paperless ID -> fingerprint of the properties last seen on or written to the page
+        self._doc_fingerprints: Dict[int, tuple] = {}
+        # Paperless IDs whose page creation failed in a way that may still have created the page
+        self._unconfirmed_creates: Set[int] = set()
 
-    def create_or_update_document(self, document: Dict, document_file: bytes = None, filename: str = None) -> Dict:
+    def create_or_update_document(self, document: Dict, filename: Optional[str] = None) -> Dict:
         """Create or update a document in Notion"""
         try:
-            # Debug log the document structure and type
-            logger.debug(f"Document type: {type(document)}")
-            logger.debug(f"Document data: {json.dumps(document, indent=2, default=str)}")
-            
             # Validate document structure
             if not isinstance(document, dict):
                 raise ValueError(f"Document is not a dictionary, it is a {type(document)}")
             if 'id' not in document:
                 raise ValueError("Document does not contain 'id'")
 
-            # Log document ID and type
-            logger.debug(f"Document ID: {document['id']} (type: {type(document['id'])})")
+            # Serialised only when debug logging is enabled
+            logger.opt(lazy=True).debug(
+                "Document {} data: {}", lambda: document["id"],
+                lambda: _to_json(document)
+            )
 
             # Check if document already exists
-            try:
-                results = self.client.databases.query(
-                    database_id=self.documents_db,
-                    filter={
-                        "property": "paperless_id",
-                        "number": {"equals": document["id"]}
-                    }
-                )
-                logger.debug(f"Query results type: {type(results)}")
-                logger.debug(f"Query results: {json.dumps(results, indent=2)}")
-            except Exception as e:
-                logger.error(f"Error querying database: {e}")
-                raise
+            if self._doc_page_ids is None:
+                self.get_all_document_ids()
+            page_id = self._doc_page_ids.get(document["id"])
+            if not page_id and document["id"] in self._unconfirmed_creates:
+                # Look for the page a failed create may have left behind before creating another
+                page_id = self._find_page_id(self.documents_db, document["id"])
+                if page_id:
+                    self._doc_page_ids[document["id"]] = page_id
+                self._unconfirmed_creates.discard(document["id"])
+            logger.debug(f"Existing page for document {document['id']}: {page_id}")
 
             # Convert dates to ISO format if they're not already
-            created_date = document.get("created", "")
-            logger.debug(f"Created date before processing: {created_date} (type: {type(created_date)})")
-            
-            if isinstance(created_date, (int, float)):
-                created_date = datetime.fromtimestamp(created_date).isoformat()
-            elif isinstance(created_date, str):
-                try:
-                    created_date = datetime.fromisoformat(created_date).isoformat()
-                except ValueError:
-                    created_date = None
-            
-            added_date = document.get("added", "")
-            logger.debug(f"Added date before processing: {added_date} (type: {type(added_date)})")
-            
-            if isinstance(added_date, (int, float)):
-                added_date = datetime.fromtimestamp(added_date).isoformat()
-            elif isinstance(added_date, str):
-                try:
-                    added_date = datetime.fromisoformat(added_date).isoformat()
-                except ValueError:
-                    added_date = None
-
-            # Debug log the processed dates
+            created_date = _normalize_date(document.get("created", ""))
+            added_date = _normalize_date(document.get("added", ""))
             logger.debug(f"Processed dates - created: {created_date}, added: {added_date}")
+            # Relations left out of the page; reported once it is written so the sync retries them
+            unresolved = []
 
             properties = {
                 "Title": {"title": [{"text": {"content": str(document.get("title", "Untitled"))}}]},
@@ -82,12 +199,8 @@ class NotionClient:
             
             properties["Archived"] = {"checkbox": False}
 
-            # Debug log the properties
-            logger.debug(f"Properties before relations: {json.dumps(properties, indent=2)}")
-
             if document.get("correspondent"):
                 try:
-                    logger.debug(f"Correspondent data: {json.dumps(document['correspondent'], indent=2)}")
                     correspondent_data = document["correspondent"]
                     if isinstance(correspondent_data, (int, str)):
                         correspondent_id = self._get_correspondent_page_id(int(correspondent_data))
@@ -98,88 +211,132 @@ class NotionClient:
                     }
                 except Exception as e:
                     logger.warning(f"Could not link correspondent: {e}")
+                    unresolved.append(f"correspondent ({e})")
 
             if document.get("tags"):
                 try:
-                    logger.debug(f"Tags data: {json.dumps(document['tags'], indent=2)}")
-                    tag_ids = []
-                    for tag in document["tags"]:
-                        if isinstance(tag, (int, str)):
-                            tag_id = self._get_tag_page_id(int(tag))
-                        else:
-                            tag_id = self._get_tag_page_id(tag.get("id"))
-                        tag_ids.append(tag_id)
+                    tag_ids = [
+                        int(tag) if isinstance(tag, (int, str)) else int(tag.get("id"))
+                        for tag in document["tags"]
+                    ]
+                    tag_page_ids = self._get_tag_page_ids(tag_ids)
+                    missing = [tag_id for tag_id in tag_ids if tag_id not in tag_page_ids]
+                    if missing:
+                        logger.warning(f"Tags with Paperless IDs {missing} not found in Notion")
+                        unresolved.append(f"tags {missing}")
                     
-                    if tag_ids:
+                    if tag_page_ids:
                         properties["Tags"] = {
-                            "relation": [{"id": tag_id} for tag_id in tag_ids]
+                            "relation": [{"id": tag_page_ids[tag_id]} for tag_id in tag_ids if tag_id in tag_page_ids]
                         }
                 except Exception as e:
                     logger.warning(f"Could not link tags: {e}")
+                    unresolved.append(f"tags ({e})")
 
-            # Handle file upload if provided
-            if document_file and filename:
-                try:
-                    # Get file properties with document ID
-                    file_props = self._upload_file_to_notion(document_file, filename, document["id"])
-                    logger.debug(f"File properties: {json.dumps(file_props, indent=2)}")
-                    
-                    # Add file property
-                    properties["File"] = {
-                        "files": [{
-                            "type": "external",
-                            "name": file_props["name"],
-                            "external": {
-                                "url": file_props["url"]
-                            }
-                        }]
-                    }
-                except Exception as e:
-                    logger.warning(f"Could not handle file: {e}")
+            # Link the file in Paperless-NGX; the name comes from the document metadata
+            filename = (filename or document.get("archived_file_name")
+                        or document.get("original_file_name") or "document.pdf")
+            try:
+                file_props = self._get_file_properties(filename, document["id"])
+                # Add file property
+                properties["File"] = {
+                    "files": [{
+                        "type": "external",
+                        "name": file_props["name"],
+                        "external": {
+                            "url": file_props["url"]
+                        }
+                    }]
+                }
+            except Exception as e:
+                logger.warning(f"Could not handle file: {e}")
 
-            # Debug log final properties
-            logger.debug(f"Final properties: {json.dumps(properties, indent=2)}")
+            logger.opt(lazy=True).debug("Final properties: {}", lambda: _to_json(properties))
 
-            if results["results"]:
+            fingerprint = _fingerprint(properties, DOCUMENT_PROPERTIES)
+            if page_id and self._doc_fingerprints.get(document["id"]) == fingerprint:
+                logger.debug(f"Document {document['id']} unchanged, skipping update")
+                page = {"id": page_id}
+            elif page_id:
                 # Update existing page
-                return self.client.pages.update(
-                    page_id=results["results"][0]["id"],
+                page = self.client.pages.update(
+                    page_id=page_id,
                     properties=properties
                 )
             else:
                 # Create new page
-                return self.client.pages.create(
-                    parent={"database_id": self.documents_db},
-                    properties=properties
-                )
+                try:
+                    page = self.client.pages.create(
+                        parent={"database_id": self.documents_db},
+                        properties=properties
+                    )
+                except Exception:
+                    self._unconfirmed_creates.add(document["id"])
+                    raise
+                self._doc_page_ids[document["id"]] = page["id"]
+            self._doc_fingerprints[document["id"]] = fingerprint
         except Exception as e:
             logger.error(f"Error creating/updating document in Notion: {e}")
             raise
 
+        if unresolved:
+            raise UnresolvedRelationsError(f"Could not link {', '.join(unresolved)} for document {document['id']}")
+        return page
+
+    def clear_id_caches(self) -> None:
+        """Drop cached tag and correspondent page IDs so the next lookup reloads them"""
+        self._tag_id_cache = None
+        self._correspondent_id_cache = None
+
     def get_all_document_ids(self) -> Dict[int, str]:
         """Get all document IDs and their page IDs from Notion"""
-        documents = {}
-        has_more = True
-        start_cursor = None
-
-        while has_more:
-            response = self.client.databases.query(
-                database_id=self.documents_db,
-                start_cursor=start_cursor
-            )
-            
-            for page in response["results"]:
-                try:
-                    paperless_id = page["properties"]["paperless_id"]["number"]
-                    if paperless_id:
-                        documents[paperless_id] = page["id"]
-                except (KeyError, TypeError):
-                    continue
+        # Also refreshes the page IDs and fingerprints used by create_or_update_document
+        pages = self._load_pages(self.documents_db)
+        self._doc_page_ids = {paperless_id: page["id"] for paperless_id, page in pages.items()}
+        self._unconfirmed_creates.clear()
+        self._doc_fingerprints = {
+            paperless_id: _fingerprint(page["properties"], DOCUMENT_PROPERTIES)
+            for paperless_id, page in pages.items()
+        }
+        return dict(self._doc_page_ids)
+
+    def _load_id_cache(self, database_id: str, filter: Optional[Dict] = None) -> Dict[int, str]:
+        """Map Paperless IDs to Notion page IDs for every (matching) page in a database"""
+        return {paperless_id: page["id"] for paperless_id, page in self._load_pages(database_id, filter).items()}
 
-            has_more = response["has_more"]
-            start_cursor = response["next_cursor"] if has_more else None
+    def _load_pages(self, database_id: str, filter: Optional[Dict] = None) -> Dict[int, Dict]:
+        """Map Paperless IDs to the full Notion page for every (matching) page in a database"""
+        pages = {}
+        for page in self._iter_database(database_id, filter):
+            try:
+                paperless_id = page["properties"]["paperless_id"]["number"]
+                if paperless_id:
+                    pages[paperless_id] = page
+            except (KeyError, TypeError):
+                continue
+
+        return pages
+
+    def _iter_database(self, database_id: str, filter: Optional[Dict] = None) -> Iterator[Dict]:
+        """Yield every (matching) page of a database, fetching the next batch while the current one is consumed"""
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(self._query_database, database_id, None, filter)
+            while future is not None:
+                response = future.result()
+                future = None
+                if response["has_more"]:
+                    # Single-slot prefetch keeps us well under Notion's rate limit
+                    future = executor.submit(self._query_database, database_id, response["next_cursor"], filter)
+                yield from response["results"]
 
-        return documents
+    def _query_database(self, database_id: str, start_cursor: Optional[str], filter: Optional[Dict] = None) -> Dict:
+        """Fetch one batch of pages from a database"""
+        kwargs = {"database_id": database_id, "page_size": PAGE_SIZE}
+        if start_cursor:
+            kwargs["start_cursor"] = start_cursor
+        if filter:
+            kwargs["filter"] = filter
+        return self.client.databases.query(**kwargs)
 
     def archive_document(self, page_id: str) -> None:
         """Mark a document as archived in Notion"""
@@ -195,12 +352,11 @@ class NotionClient:
             logger.error(f"Error archiving document in Notion: {e}")
             raise
 
-    def _upload_file_to_notion(self, file_content: bytes, filename: str, document_id: int) -> Dict:
+    def _get_file_properties(self, filename: str, document_id: int) -> Dict:
         """Create a direct URL to the document in Paperless-NGX"""
         try:
             # Use the actual Paperless-NGX download URL
-            paperless_url = os.getenv("PAPERLESS_URL").rstrip("/")
-            download_url = f"{paperless_url}/api/documents/{document_id}/download/"
+            download_url = f"{self.paperless_url}/api/documents/{document_id}/download/"
             
             # Truncate filename if it's too long (Notion has a 100-char limit)
             if len(filename) > 100:
@@ -226,30 +382,23 @@ class NotionClient:
     def create_or_update_tag(self, tag: Dict) -> Dict:
         """Create or update a tag in Notion"""
         try:
-            results = self.client.databases.query(
-                database_id=self.tags_db,
-                filter={
-                    "property": "paperless_id",
-                    "number": {"equals": tag["id"]}
-                }
-            )
+            page_id = self._find_page_id(self.tags_db, tag["id"])
 
-            properties = {
-                "Name": {"title": [{"text": {"content": tag["name"]}}]},
-                "paperless_id": {"number": tag["id"]},
-                "Color": {"rich_text": [{"text": {"content": tag.get("color", "")}}]}
-            }
+            properties = self._tag_properties(tag)
 
-            if results["results"]:
+            if page_id:
                 return self.client.pages.update(
-                    page_id=results["results"][0]["id"],
+                    page_id=page_id,
                     properties=properties
                 )
             else:
-                return self.client.pages.create(
+                page = self.client.pages.create(
                     parent={"database_id": self.tags_db},
                     properties=properties
                 )
+                if self._tag_id_cache is not None:
+                    self._tag_id_cache[tag["id"]] = page["id"]
+                return page
         except Exception as e:
             logger.error(f"Error creating/updating tag in Notion: {e}")
             raise
@@ -257,48 +406,93 @@ class NotionClient:
     def create_or_update_correspondent(self, correspondent: Dict) -> Dict:
         """Create or update a correspondent in Notion"""
         try:
-            results = self.client.databases.query(
-                database_id=self.correspondents_db,
-                filter={
-                    "property": "paperless_id",
-                    "number": {"equals": correspondent["id"]}
-                }
-            )
+            page_id = self._find_page_id(self.correspondents_db, correspondent["id"])
 
-            properties = {
-                "Name": {"title": [{"text": {"content": correspondent["name"]}}]},
-                "paperless_id": {"number": correspondent["id"]}
-            }
+            properties = self._correspondent_properties(correspondent)
 
-            if results["results"]:
+            if page_id:
                 return self.client.pages.update(
-                    page_id=results["results"][0]["id"],
+                    page_id=page_id,
                     properties=properties
                 )
             else:
-                return self.client.pages.create(
+                page = self.client.pages.create(
                     parent={"database_id": self.correspondents_db},
                     properties=properties
                 )
+                if self._correspondent_id_cache is not None:
+                    self._correspondent_id_cache[correspondent["id"]] = page["id"]
+                return page
         except Exception as e:
             logger.error(f"Error creating/updating correspondent in Notion: {e}")
             raise
 
-    def _get_tag_page_id(self, paperless_id: int) -> str:
-        """Get Notion page ID for a tag by its Paperless ID"""
-        # Ensure paperless_id is an integer
-        if isinstance(paperless_id, dict):
-            paperless_id = paperless_id.get('id')
-        paperless_id = int(paperless_id)
-        
-        logger.debug(f"Getting tag page ID for paperless_id: {paperless_id}")
-        results = self.client.databases.query(
-            database_id=self.tags_db,
-            filter={"property": "paperless_id", "number": {"equals": paperless_id}}
+    def sync_tags(self, tags: List[Dict]) -> None:
+        """Sync all tags in one pass, writing only new or changed ones"""
+        self._tag_id_cache = self._sync_pages(self.tags_db, tags, self._tag_properties)
+
+    def sync_correspondents(self, correspondents: List[Dict]) -> None:
+        """Sync all correspondents in one pass, writing only new or changed ones"""
+        self._correspondent_id_cache = self._sync_pages(
+            self.correspondents_db, correspondents, self._correspondent_properties
         )
-        if not results["results"]:
-            raise ValueError(f"Tag with Paperless ID {paperless_id} not found in Notion")
-        return results["results"][0]["id"]
+
+    def _sync_pages(self, database_id: str, items: List[Dict], build_properties) -> Dict[int, str]:
+        """Diff Paperless items against a database and return the resulting ID map"""
+        existing = self._load_pages(database_id)
+        page_ids = {paperless_id: page["id"] for paperless_id, page in existing.items()}
+
+        for item in items:
+            properties = build_properties(item)
+            page = existing.get(item["id"])
+            try:
+                if page is None:
+                    created = self.client.pages.create(
+                        parent={"database_id": database_id},
+                        properties=properties
+                    )
+                    page_ids[item["id"]] = created["id"]
+                    logger.debug(f"Created {item['name']} in Notion")
+                elif _fingerprint(page["properties"], properties) != _fingerprint(properties, properties):
+                    self.client.pages.update(
+                        page_id=page["id"],
+                        properties=properties
+                    )
+                    logger.debug(f"Updated {item['name']} in Notion")
+            except Exception as e:
+                logger.error(f"Error syncing {item['name']} to Notion: {e}")
+
+        return page_ids
+
+    def _tag_properties(self, tag: Dict) -> Dict:
+        """Notion properties for a tag"""
+        return {
+            "Name": {"title": [{"text": {"content": tag["name"]}}]},
+            "paperless_id": {"number": tag["id"]},
+            "Color": {"rich_text": [{"text": {"content": tag.get("color", "")}}]}
+        }
+
+    def _correspondent_properties(self, correspondent: Dict) -> Dict:
+        """Notion properties for a correspondent"""
+        return {
+            "Name": {"title": [{"text": {"content": correspondent["name"]}}]},
+            "paperless_id": {"number": correspondent["id"]}
+        }
+
+    def _get_tag_page_ids(self, paperless_ids: List[int]) -> Dict[int, str]:
+        """Get Notion page IDs for tags by Paperless ID, with one query for all cache misses"""
+        if self._tag_id_cache is None:
+            self._tag_id_cache = self._load_id_cache(self.tags_db)
+        
+        missing = [paperless_id for paperless_id in paperless_ids if paperless_id not in self._tag_id_cache]
+        if missing:
+            logger.debug(f"Tags {missing} not in cache, querying Notion")
+            self._tag_id_cache.update(self._find_page_ids(self.tags_db, missing))
+        
+        return {
+            paperless_id: self._tag_id_cache[paperless_id]
+            for paperless_id in paperless_ids if paperless_id in self._tag_id_cache
+        }
 
     def _get_correspondent_page_id(self, paperless_id: int) -> str:
         """Get Notion page ID for a correspondent by its Paperless ID"""
@@ -307,11 +501,31 @@ class NotionClient:
             paperless_id = paperless_id.get('id')
         paperless_id = int(paperless_id)
         
-        logger.debug(f"Getting correspondent page ID for paperless_id: {paperless_id}")
+        if self._correspondent_id_cache is None:
+            self._correspondent_id_cache = self._load_id_cache(self.correspondents_db)
+        page_id = self._correspondent_id_cache.get(paperless_id)
+        if page_id:
+            return page_id
+        
+        logger.debug(f"Correspondent {paperless_id} not in cache, querying Notion")
+        page_id = self._find_page_id(self.correspondents_db, paperless_id)
+        if not page_id:
+            raise ValueError(f"Correspondent with Paperless ID {paperless_id} not found in Notion")
+        self._correspondent_id_cache[paperless_id] = page_id
+        return page_id
+
+    def _find_page_id(self, database_id: str, paperless_id: int) -> Optional[str]:
+        """Query a database for the page with the given Paperless ID"""
         results = self.client.databases.query(
-            database_id=self.correspondents_db,
-            filter={"property": "paperless_id", "number": {"equals": paperless_id}}
+            database_id=database_id,
+            filter=_eq_filter(paperless_id)
         )
-        if not results["results"]:
-            raise ValueError(f"Correspondent with Paperless ID {paperless_id} not found in Notion")
-        return results["results"][0]["id"] 
\ No newline at end of file
+        return results["results"][0]["id"] if results["results"] else None
+
+    def _find_page_ids(self, database_id: str, paperless_ids: List[int]) -> Dict[int, str]:
+        """Query a database for the pages with any of the given Paperless IDs"""
+        page_ids = {}
+        for start in range(0, len(paperless_ids), MAX_FILTER_CONDITIONS):
+            chunk = paperless_ids[start:start + MAX_FILTER_CONDITIONS]
+            page_ids.update(self._load_id_cache(database_id, filter={"or": [_eq_filter(i) for i in chunk]}))
+        return page_ids
\ No newline at end of file
@@ -1,124 +1,236 @@
-import os
-from typing import Dict, List, Optional, Tuple, Set
+import math
+import re
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from urllib.parse import unquote
+from typing import IO, Dict, Iterator, List, Optional, Tuple, Set
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
 from loguru import logger
-import json
+import orjson
+from config import Config
+
+# Results per page on list endpoints; the Paperless default of 25 means many round-trips
+PAGE_SIZE = 500
+# Read size when streaming file bodies
+CHUNK_SIZE = 64 * 1024
+# Downloads larger than this are spooled to a temporary file instead of memory
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+# (connect, read) timeouts in seconds for API calls and file downloads
+REQUEST_TIMEOUT = (5, 30)
+DOWNLOAD_TIMEOUT = (5, 60)
+# Content-Disposition filenames: RFC 5987 filename*=UTF-8''... (percent-encoded) and plain filename="..."
+_CD_FILENAME_EXT = re.compile(r"filename\*=(?:UTF-8'')?([^;]+)", re.IGNORECASE)
+_CD_FILENAME = re.compile(r'filename="?([^";]+)"?', re.IGNORECASE)
+
+
+def _filename_from_disposition(content_disposition: str) -> str:
+    """Extract the download filename from a Content-Disposition header"""
+    match = _CD_FILENAME_EXT.search(content_disposition)
+    if match:
+        return unquote(match.group(1).strip())
+    match = _CD_FILENAME.search(content_disposition)
+    return match.group(1) if match else "document.pdf"
+
 
 class PaperlessClient:
-    def __init__(self):
-        self.base_url = os.getenv("PAPERLESS_URL").rstrip("/")
-        self.token = os.getenv("PAPERLESS_TOKEN")
-        self.headers = {
-            "Authorization": f"Token {self.token}",
-            "Content-Type": "application/json"
-        }
+    def __init__(self, config: Optional[Config] = None):
+        config = config or Config.from_env()
+        self.base_url = config.paperless_url
+        self.max_workers = config.paperless_max_workers
+        self.metadata_ttl = config.metadata_cache_ttl
+        self._metadata_cache: Dict[str, Tuple[float, List[Dict]]] = {}
+        
+        # Reuse keep-alive connections instead of a new TCP/TLS handshake per request.
+        # Only authentication is set here; requests are GETs, so there is no Content-Type to send.
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Token {config.paperless_token}"
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            # Room for concurrent page fetches and previews sharing the pool
+            pool_maxsize=max(32, self.max_workers),
+            # Also retries rate limits and transient 5xx, honouring Retry-After
+            max_retries=Retry(
+                total=5,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504]
+            )
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
     
     def _make_request(self, endpoint: str, method: str = "GET", params: Dict = None) -> dict:
         url = f"{self.base_url}/api/{endpoint}"
         try:
-            response = requests.request(method, url, headers=self.headers, params=params)
+            response = self.session.request(method, url, params=params, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
-            data = response.json()
-            logger.debug(f"API Response from {endpoint}: {json.dumps(data, indent=2)}")
+            # orjson parses large list pages several times faster than the stdlib json module
+            data = orjson.loads(response.content)
+            # Serialised only when debug logging is enabled
+            logger.opt(lazy=True).debug(
+                "API Response from {}: {}", lambda: endpoint, lambda: orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()
+            )
             return data
         except requests.exceptions.RequestException as e:
             logger.error(f"Error making request to Paperless-NGX: {e}")
             raise
 
-    def get_documents(self, modified_after: Optional[datetime] = None) -> List[Dict]:
-        """Get all documents, optionally filtered by modification date"""
+    def get_documents(self, modified_after: Optional[datetime] = None,
+                      fields: Optional[List[str]] = None) -> List[Dict]:
+        """Get all documents, optionally filtered by modification date and limited to some fields"""
+        return list(self.iter_documents(modified_after=modified_after, fields=fields))
+
+    def iter_documents(self, modified_after: Optional[datetime] = None,
+                       fields: Optional[List[str]] = None) -> Iterator[Dict]:
+        """Yield documents as their pages arrive, optionally filtered by modification date"""
         params = {}
         if modified_after:
-            params["modified__after"] = modified_after.isoformat()
+            params["modified__gt"] = modified_after.isoformat()
+        if fields:
+            # Skips heavy fields such as the OCR content when the caller doesn't need them
+            params["fields"] = ",".join(fields)
         
-        all_documents = []
-        page = 1
+        total = 0
+        for doc in self._iter_results("documents/", params):
+            logger.opt(lazy=True).debug(
+                "Document {} structure: {}", lambda: doc["id"], lambda: orjson.dumps(doc, option=orjson.OPT_INDENT_2, default=str).decode()
+            )
+            total += 1
+            yield doc
         
-        while True:
-            params["page"] = page
-            response = self._make_request("documents/", params=params)
-            documents = response["results"]
-            
-            # Debug log each document
-            for doc in documents:
-                logger.debug(f"Document {doc['id']} structure: {json.dumps(doc, indent=2, default=str)}")
-            
-            all_documents.extend(documents)
-            
-            # Check if there are more pages
-            if response["next"]:
-                page += 1
-                logger.info(f"Fetching page {page} of documents...")
-            else:
-                break
-        
-        logger.info(f"Retrieved {len(all_documents)} documents in total")
-        return all_documents
+        logger.info(f"Retrieved {total} documents in total")
 
     def get_all_document_ids(self) -> Set[int]:
         """Get all current document IDs from Paperless-NGX"""
-        all_ids = set()
-        page = 1
-        
-        while True:
-            response = self._make_request("documents/", params={"page": page})
-            documents = response["results"]
-            
-            # Add document IDs to the set
-            all_ids.update(doc["id"] for doc in documents)
-            
-            # Check if there are more pages
-            if response["next"]:
-                page += 1
-                logger.debug(f"Fetching page {page} of document IDs...")
-            else:
-                break
-        
+        all_ids = {doc["id"] for doc in self._iter_results("documents/", {"fields": "id"})}
         logger.info(f"Retrieved {len(all_ids)} document IDs in total")
         return all_ids
 
+    def _iter_results(self, endpoint: str, params: Optional[Dict] = None) -> Iterator[Dict]:
+        """Yield every result of a paginated list endpoint, in order, fetching pages concurrently"""
+        # A stable order keeps concurrently requested offset pages from overlapping or leaving gaps;
+        # new objects get higher IDs, so they land at the end instead of shifting everything after them
+        params = {"page_size": PAGE_SIZE, "ordering": "id", **(params or {})}
+        last = self._make_request(endpoint, params={**params, "page": 1})
+        yield from last["results"]
+        if not last["next"]:
+            return
+        
+        # The first page tells us how many more there are, so they can be requested side by side
+        total_pages = math.ceil(last["count"] / len(last["results"]))
+        logger.debug(f"Fetching {total_pages - 1} more pages of {endpoint}...")
+        pages = iter(range(2, total_pages + 1))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # Keep at most max_workers pages in flight and yield them in order
+            in_flight = deque(
+                executor.submit(self._fetch_page, endpoint, params, page)
+                for page in islice(pages, self.max_workers)
+            )
+            while in_flight:
+                last = in_flight.popleft().result()
+                page = next(pages, None)
+                if page is not None:
+                    in_flight.append(executor.submit(self._fetch_page, endpoint, params, page))
+                yield from last["results"]
+        
+        # Objects added during the scan can push results past the pages counted up front
+        page = total_pages + 1
+        while last["next"]:
+            last = self._fetch_page(endpoint, params, page)
+            yield from last["results"]
+            page += 1
+
+    def _fetch_page(self, endpoint: str, params: Dict, page: int) -> Dict:
+        """Fetch one page of a list endpoint; pages past the end (after deletions) are empty"""
+        try:
+            return self._make_request(endpoint, params={**params, "page": page})
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return {"results": [], "next": None}
+            raise
+
     def get_document(self, doc_id: int) -> Optional[Dict]:
         """Get a specific document's details"""
         try:
             return self._make_request(f"documents/{doc_id}/")
         except requests.exceptions.RequestException as e:
-            if e.response and e.response.status_code == 404:
+            if e.response is not None and e.response.status_code == 404:
                 return None
             raise
 
-    def get_document_file(self, doc_id: int) -> Tuple[bytes, str]:
-        """Get the actual document file from Paperless-NGX"""
+    def get_document_file(self, doc_id: int) -> Tuple[IO[bytes], str]:
+        """Get the actual document file from Paperless-NGX as a file object, spilling large files to disk"""
         url = f"{self.base_url}/api/documents/{doc_id}/download/"
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
         try:
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
+            response = self._stream_to(url, spool)
+            spool.seek(0)
             
             # Get filename from Content-Disposition header or use a default
-            filename = "document.pdf"
-            content_disposition = response.headers.get("Content-Disposition")
-            if content_disposition:
-                import re
-                matches = re.findall('filename="(.+)"', content_disposition)
-                if matches:
-                    filename = matches[0]
-            
-            return response.content, filename
+            filename = _filename_from_disposition(response.headers.get("Content-Disposition") or "")
+            return spool, filename
         except requests.exceptions.RequestException as e:
+            spool.close()
             logger.error(f"Error downloading document from Paperless-NGX: {e}")
             raise
 
     def get_tags(self) -> List[Dict]:
         """Get all tags"""
-        return self._make_request("tags/")["results"]
+        return self._get_cached_list("tags/")
 
     def get_correspondents(self) -> List[Dict]:
         """Get all correspondents"""
-        return self._make_request("correspondents/")["results"]
+        return self._get_cached_list("correspondents/")
+
+    def invalidate_metadata(self) -> None:
+        """Forget cached tags and correspondents so the next call refetches them"""
+        self._metadata_cache.clear()
+
+    def _get_cached_list(self, endpoint: str) -> List[Dict]:
+        """Get all results of a list endpoint, reusing them until they are older than the TTL"""
+        cached = self._metadata_cache.get(endpoint)
+        if cached and time.monotonic() - cached[0] < self.metadata_ttl:
+            logger.debug(f"Using cached {endpoint} list")
+            return cached[1]
+        results = list(self._iter_results(endpoint))
+        self._metadata_cache[endpoint] = (time.monotonic(), results)
+        return results
 
     def get_document_preview(self, doc_id: int) -> bytes:
         """Get document preview/thumbnail"""
         url = f"{self.base_url}/api/documents/{doc_id}/preview/"
-        response = requests.get(url, headers=self.headers)
-        response.raise_for_status()
-        return response.content 
\ No newline at end of file
+        with self.session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            # Fill one buffer sized from Content-Length rather than joining chunks as Response.content does;
+            # a compressed body can decode to more than that, which grows the buffer past its end
+            buffer = bytearray(int(response.headers.get("Content-Length") or 0))
+            size = 0
+            for chunk in response.iter_content(CHUNK_SIZE):
+                buffer[size:size + len(chunk)] = chunk
+                size += len(chunk)
+            del buffer[size:]
+            return bytes(buffer)
+
+    def stream_document_preview(self, doc_id: int, sink: IO[bytes], chunk_size: int = CHUNK_SIZE) -> None:
+        """Write document preview/thumbnail to a file-like object without holding it in memory"""
+        url = f"{self.base_url}/api/documents/{doc_id}/preview/"
+        self._stream_to(url, sink, chunk_size)
+
+    def _stream_to(self, url: str, sink: IO[bytes], chunk_size: int = CHUNK_SIZE) -> requests.Response:
+        """Copy a response body into sink chunk by chunk, returning the response for its headers"""
+        with self.session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size):
+                sink.write(chunk)
+            return response
+
+    def get_document_previews(self, doc_ids: List[int]) -> Dict[int, bytes]:
+        """Get previews for several documents concurrently"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            previews = executor.map(self.get_document_preview, doc_ids)
+            return dict(zip(doc_ids, previews))
\ No newline at end of file
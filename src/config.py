@@ -0,0 +1,50 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass(frozen=True)
+class Config:
+    """Service settings, read once from the environment"""
+    paperless_url: str
+    paperless_token: str
+    # Upper bound on concurrent requests to Paperless-NGX
+    paperless_max_workers: int
+    # Tags and correspondents rarely change, so their lists are reused for a while
+    metadata_cache_ttl: int
+    notion_token: str
+    notion_documents_db: str
+    notion_tags_db: str
+    notion_correspondents_db: str
+    # Notion allows ~3 requests per second, so keep this small
+    notion_max_workers: int
+    sync_interval: int
+    # Seconds between full scans for documents deleted in Paperless
+    reconcile_interval: int
+    # Port for Paperless-NGX workflow webhooks; 0 disables the listener
+    webhook_port: int
+    # Seconds to let a burst of webhook events settle before syncing
+    webhook_debounce: float
+    state_file: Path
+    log_level: str
+
+    @classmethod
+    def from_env(cls) -> "Config":
+        """Load the configuration from environment variables, applying defaults"""
+        return cls(
+            paperless_url=os.getenv("PAPERLESS_URL", "").rstrip("/"),
+            paperless_token=os.getenv("PAPERLESS_TOKEN"),
+            paperless_max_workers=int(os.getenv("PAPERLESS_MAX_WORKERS", 10)),
+            metadata_cache_ttl=int(os.getenv("METADATA_CACHE_TTL", 3600)),
+            notion_token=os.getenv("NOTION_TOKEN"),
+            notion_documents_db=os.getenv("NOTION_DOCUMENTS_DB"),
+            notion_tags_db=os.getenv("NOTION_TAGS_DB"),
+            notion_correspondents_db=os.getenv("NOTION_CORRESPONDENTS_DB"),
+            notion_max_workers=int(os.getenv("NOTION_MAX_WORKERS", 3)),
+            sync_interval=int(os.getenv("SYNC_INTERVAL", 3600)),
+            reconcile_interval=int(os.getenv("RECONCILE_INTERVAL", 86400)),
+            webhook_port=int(os.getenv("WEBHOOK_PORT", 0)),
+            webhook_debounce=float(os.getenv("WEBHOOK_DEBOUNCE", 5)),
+            state_file=Path(os.getenv("STATE_FILE", "/app/state/last_sync.json")),
+            log_level=os.getenv("LOG_LEVEL", "DEBUG"),
+        )
@@ -1,14 +1,19 @@
 import os
+import json
+import threading
 import time
-from datetime import datetime, timedelta
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime
+from typing import Dict, Optional
 from dotenv import load_dotenv
 from loguru import logger
 from clients.paperless import PaperlessClient
-from clients.notion import NotionClient
+from clients.notion import DOCUMENT_FIELDS, NotionClient, UnresolvedRelationsError
+from config import Config
+from webhook import start_webhook_server
 
-def setup_logging():
+def setup_logging(log_level: str):
     """Configure logging"""
-    log_level = os.getenv("LOG_LEVEL", "DEBUG")
     logger.remove()
     
     # Create logs directory if it doesn't exist
@@ -24,89 +29,194 @@ def setup_logging():
     logger.add(lambda msg: print(msg), level=log_level)
 
 class PaperlessNotionSync:
-    def __init__(self):
-        self.paperless = PaperlessClient()
-        self.notion = NotionClient()
-        self.sync_interval = int(os.getenv("SYNC_INTERVAL", 3600))
-        self.last_sync = None
+    def __init__(self, config: Config):
+        self.paperless = PaperlessClient(config)
+        self.notion = NotionClient(config)
+        self.sync_interval = config.sync_interval
+        self.notion_workers = config.notion_max_workers
+        self.reconcile_interval = config.reconcile_interval
+        self.last_reconcile: Optional[float] = None
+        self.webhook_port = config.webhook_port
+        self.webhook_debounce = config.webhook_debounce
+        self.wake = threading.Event()
+        self.state_file = config.state_file
+        self.last_sync = self.load_last_sync()
+        # Paperless IDs seen by the last tag/correspondent sync
+        self.known_tag_ids = set()
+        self.known_correspondent_ids = set()
+
+    def load_last_sync(self) -> Optional[datetime]:
+        """Load the modification watermark saved by the previous run"""
+        try:
+            return datetime.fromisoformat(json.loads(self.state_file.read_text())["last_sync"])
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable sync state in {self.state_file}: {e}")
+            return None
+
+    def save_last_sync(self):
+        """Persist the modification watermark for the next run"""
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so a crash mid-write never leaves a truncated state file
+        tmp = self.state_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"last_sync": self.last_sync.isoformat()}))
+        tmp.replace(self.state_file)
 
     def sync_correspondents(self):
         """Sync all correspondents from Paperless to Notion"""
         logger.info("Syncing correspondents...")
         correspondents = self.paperless.get_correspondents()
-        for correspondent in correspondents:
-            try:
-                self.notion.create_or_update_correspondent(correspondent)
-                logger.debug(f"Synced correspondent: {correspondent['name']}")
-            except Exception as e:
-                logger.error(f"Error syncing correspondent {correspondent['name']}: {e}")
+        self.notion.sync_correspondents(correspondents)
+        self.known_correspondent_ids = {correspondent["id"] for correspondent in correspondents}
+        logger.debug(f"Synced {len(correspondents)} correspondents")
 
     def sync_tags(self):
         """Sync all tags from Paperless to Notion"""
         logger.info("Syncing tags...")
         tags = self.paperless.get_tags()
-        for tag in tags:
-            try:
-                self.notion.create_or_update_tag(tag)
-                logger.debug(f"Synced tag: {tag['name']}")
-            except Exception as e:
-                logger.error(f"Error syncing tag {tag['name']}: {e}")
+        self.notion.sync_tags(tags)
+        self.known_tag_ids = {tag["id"] for tag in tags}
+        logger.debug(f"Synced {len(tags)} tags")
+
+    def references_unknown_metadata(self, document: Dict) -> bool:
+        """Whether a document uses a tag or correspondent missing from the last metadata sync"""
+        correspondent = document.get("correspondent")
+        if correspondent and correspondent not in self.known_correspondent_ids:
+            return True
+        return not set(document.get("tags") or []) <= self.known_tag_ids
+
+    def archive_deleted_documents(self):
+        """Archive Notion pages whose documents no longer exist in Paperless"""
+        logger.info("Checking for deleted documents...")
+        
+        # Get all current document IDs from both systems at the same time
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            paperless_future = executor.submit(self.paperless.get_all_document_ids)
+            notion_future = executor.submit(self.notion.get_all_document_ids)
+            paperless_doc_ids = paperless_future.result()
+            notion_docs = notion_future.result()
+
+        # Archive deleted documents concurrently; one failure doesn't stop the rest.
+        # The keys view diffs directly against the Paperless set without copying the Notion IDs.
+        deleted_doc_ids = notion_docs.keys() - paperless_doc_ids
+        with ThreadPoolExecutor(max_workers=self.notion_workers) as executor:
+            futures = {
+                executor.submit(self.archive_if_deleted, doc_id, notion_docs[doc_id]): doc_id
+                for doc_id in deleted_doc_ids
+            }
+            for future in as_completed(futures):
+                doc_id = futures[future]
+                try:
+                    if future.result():
+                        logger.info(f"Archived document with ID {doc_id} in Notion")
+                    else:
+                        logger.warning(f"Document {doc_id} was missing from the ID scan but still exists, not archiving")
+                except Exception as e:
+                    logger.error(f"Error archiving document {doc_id}: {e}")
+
+    def archive_if_deleted(self, doc_id: int, page_id: str) -> bool:
+        """Archive a document's Notion page if Paperless confirms the document is gone"""
+        # The ID scan can miss documents that move between pages while it runs, and nothing un-archives a page
+        if self.paperless.get_document(doc_id) is not None:
+            return False
+        self.notion.archive_document(page_id)
+        return True
 
-    def sync_documents(self):
-        """Sync documents from Paperless to Notion"""
+    def sync_documents(self) -> Optional[datetime]:
+        """Sync documents from Paperless to Notion, returning the new modification watermark"""
         logger.info("Syncing documents...")
         
-        # Get all current document IDs from both systems
-        paperless_doc_ids = self.paperless.get_all_document_ids()
-        notion_docs = self.notion.get_all_document_ids()
-        notion_doc_ids = set(notion_docs.keys())
-
-        # Find deleted documents
-        deleted_doc_ids = notion_doc_ids - paperless_doc_ids
-        for doc_id in deleted_doc_ids:
-            try:
-                self.notion.archive_document(notion_docs[doc_id])
-                logger.info(f"Archived document with ID {doc_id} in Notion")
-            except Exception as e:
-                logger.error(f"Error archiving document {doc_id}: {e}")
+        # Finding deletions needs a full ID scan of both systems, so it runs on a slower cadence
+        now = time.monotonic()
+        if self.last_reconcile is None or now - self.last_reconcile >= self.reconcile_interval:
+            self.archive_deleted_documents()
+            self.last_reconcile = now
 
-        # Get modified documents since last sync
-        documents = self.paperless.get_documents(modified_after=self.last_sync)
+        # Stream modified documents since last sync, page by page
+        documents = self.paperless.iter_documents(modified_after=self.last_sync, fields=DOCUMENT_FIELDS)
+        
+        # Only advance the watermark if every document made it to Notion
+        latest_modified = self.last_sync
+        failed = False
+        refreshed_metadata = False
+        pending = {}
         
-        # Update or create documents
-        for document in documents:
+        def finish(future):
+            nonlocal latest_modified, failed
+            document = pending.pop(future)
             try:
-                # Get the document file
-                file_content, filename = self.paperless.get_document_file(document["id"])
-                
-                # Create or update the document in Notion with the file
-                self.notion.create_or_update_document(
-                    document=document,
-                    document_file=file_content,
-                    filename=filename
-                )
+                future.result()
                 logger.debug(f"Synced document: {document['title']}")
+                modified = datetime.fromisoformat(document["modified"])
+                if latest_modified is None or modified > latest_modified:
+                    latest_modified = modified
+            except UnresolvedRelationsError as e:
+                # The page was written, but only a later sync can add the missing relations
+                failed = True
+                logger.warning(f"{e}, will retry next sync")
             except Exception as e:
+                failed = True
                 logger.error(f"Error syncing document {document['title']}: {e}")
+        
+        # Notion writes run in the pool while the next Paperless page is fetched;
+        # the backlog is bounded so memory does not grow with the library size
+        with ThreadPoolExecutor(max_workers=self.notion_workers) as executor:
+            for document in documents:
+                # Tag and correspondent lists may come from cache; refresh them once if they are stale
+                if not refreshed_metadata and self.references_unknown_metadata(document):
+                    logger.info("Found new tags or correspondents, refreshing them")
+                    self.paperless.invalidate_metadata()
+                    self.sync_correspondents()
+                    self.sync_tags()
+                    refreshed_metadata = True
+                pending[executor.submit(self.notion.create_or_update_document, document=document)] = document
+                if len(pending) >= self.notion_workers * 4:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(future)
+            for future in as_completed(list(pending)):
+                finish(future)
+        
+        return self.last_sync if failed else latest_modified
+
+    def wait_for_next_sync(self, deadline: float):
+        """Sleep until the monotonic deadline of the next sync, or until a webhook reports a change"""
+        if self.wake.wait(max(0, deadline - time.monotonic())):
+            logger.info(f"Change reported by Paperless-NGX, syncing in {self.webhook_debounce} seconds")
+            time.sleep(self.webhook_debounce)
+        # Events that arrive during the sync set the flag again and trigger one more pass
+        self.wake.clear()
 
     def run(self):
         """Main sync loop"""
         logger.info("Starting Paperless-Notion sync service")
+        if self.webhook_port:
+            start_webhook_server(self.webhook_port, self.wake.set)
         
         while True:
+            # Schedule from the start of the cycle so the time spent syncing doesn't add drift
+            deadline = time.monotonic() + self.sync_interval
             try:
-                # First sync correspondents and tags (they're needed for document relations)
-                self.sync_correspondents()
-                self.sync_tags()
+                # Reload relation targets once per cycle rather than once per lookup
+                self.notion.clear_id_caches()
                 
-                # Then sync documents
-                self.sync_documents()
+                # First sync correspondents and tags (they're needed for document relations).
+                # They are independent, so both Paperless fetches and Notion scans run side by side.
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    futures = [executor.submit(self.sync_correspondents), executor.submit(self.sync_tags)]
+                    for future in futures:
+                        future.result()
                 
-                self.last_sync = datetime.now()
-                logger.info(f"Sync completed. Next sync in {self.sync_interval} seconds")
+                # Then sync documents
+                last_sync = self.sync_documents()
+                if last_sync != self.last_sync:
+                    self.last_sync = last_sync
+                    self.save_last_sync()
+                logger.info(f"Sync completed. Next sync in {max(0, deadline - time.monotonic()):.0f} seconds")
                 
-                # Wait for next sync interval
-                time.sleep(self.sync_interval)
+                # Wait for next sync interval or webhook
+                self.wait_for_next_sync(deadline)
                 
             except Exception as e:
                 logger.error(f"Error during sync: {e}")
@@ -117,11 +227,14 @@ def main():
     # Load environment variables
     load_dotenv("config/.env")
     
+    # Read the configuration once and share it with both clients
+    config = Config.from_env()
+    
     # Setup logging
-    setup_logging()
+    setup_logging(config.log_level)
     
     # Start sync service
-    sync_service = PaperlessNotionSync()
+    sync_service = PaperlessNotionSync(config)
     sync_service.run()
 
 if __name__ == "__main__":
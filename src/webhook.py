@@ -0,0 +1,32 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+from loguru import logger
+
+# Endpoint Paperless-NGX workflow webhooks should POST to
+WEBHOOK_PATH = "/paperless-hook"
+
+
+def start_webhook_server(port: int, on_event: Callable[[], None]) -> ThreadingHTTPServer:
+    """Accept Paperless-NGX webhooks in a background thread, calling on_event for each one"""
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path.split("?")[0] != WEBHOOK_PATH:
+                self.send_error(404)
+                return
+
+            # Only the fact that something changed matters; the incremental sync finds what it was
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            on_event()
+            self.send_response(202)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            logger.debug(f"Webhook request from {self.address_string()}: {format % args}")
+
+    server = ThreadingHTTPServer(("", port), WebhookHandler)
+    threading.Thread(target=server.serve_forever, name="webhook", daemon=True).start()
+    logger.info(f"Listening for Paperless-NGX webhooks on port {port} at {WEBHOOK_PATH}")
+    return server